@@ -1,124 +1,302 @@
 import streamlit as st
 import pandas as pd
 import yfinance as yf
-from datetime import datetime, timedelta
-import pytz
+from yfinance.exceptions import YFPricesMissingError
+from datetime import datetime, timedelta, timezone, time as dt_time
+from zoneinfo import ZoneInfo
 import time
+import random
+import math
+from dataclasses import dataclass
+import diskcache
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Persistent cache for yfinance downloads, survives Streamlit reruns and restarts
+cache = diskcache.Cache('.yf_cache')
+HISTORY_TTL = 30 * 24 * 3600  # Past days are complete, keep them for a month
+
+AR_TZ = ZoneInfo('America/Argentina/Buenos_Aires')
+MARKET_OPEN = dt_time(11, 30)
+MARKET_CLOSE = dt_time(17, 0)
+# Span of the BYMA and NYSE sessions in Argentina time, covering both EDT (10:30-17:00) and
+# EST (11:30-18:00); prices can move at any point inside it
+SESSION_START = dt_time(10, 30)
+SESSION_END = dt_time(18, 0)
+CLOSE_WINDOW = timedelta(minutes=10)  # Search window around 17:00 for the US reference price
+
+# Shared pool for network-bound downloads; widgets are still rendered on the main thread
+_executor = ThreadPoolExecutor(max_workers=16)
+
+# yf.download collects results in module-level state (shared._DFS) on every call, whatever the
+# threads flag, so concurrent multi-symbol downloads can mix up each other's tickers; only one
+# runs at a time. Single-ticker downloads use Ticker.history, which doesn't touch that state.
+_download_lock = threading.Lock()
+
+# Retries shared by all downloads in this process, so a rate-limited Yahoo isn't hammered by
+# every ticker retrying on its own
+MAX_RETRIES_PER_MINUTE = 10
+_retry_lock = threading.Lock()
+_retry_budget = {'minute': 0, 'used': 0}
+
+# Pre-bound formatters for prices shown in the UI and the summary
+_fmt_ars = 'ARS {:.2f}'.format
+_fmt_usd = 'USD {:.2f}'.format
+SUMMARY_FORMATS = {
+    'Cierre Argentina': _fmt_ars,
+    'Precio EEUU 17:00': _fmt_usd,
+    'Cierre EEUU': _fmt_usd,
+    'Precio Teórico': _fmt_ars,
+    'Diferencia': _fmt_ars,
+    'Diferencia %': '{:+.2f}%'.format,
+    'TC Implícito 17:00': _fmt_ars,
+    'TC Implícito Actual': _fmt_ars
+}
+
+
+def _submit(fn, *args, **kwargs):
+    """
+    Submit fn to the shared pool, attaching the current Streamlit script context so that
+    st.info/st.error calls made from the worker thread reach the page
+    """
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+
+    return _executor.submit(run)
+
+
+def _take_retry():
+    """
+    Take one retry from the per-process budget
+    Returns: bool, False once this minute's budget is spent
+    """
+    minute = int(time.time() // 60)
+    with _retry_lock:
+        if _retry_budget['minute'] != minute:
+            _retry_budget.update(minute=minute, used=0)
+        if _retry_budget['used'] >= MAX_RETRIES_PER_MINUTE:
+            return False
+        _retry_budget['used'] += 1
+        return True
 
 
-def get_yf_data(ticker, start_date, end_date, apply_delay=False, retries=3):
+def _bar_ends(index, interval):
+    """
+    Label bars by their end in UTC, the time their close was printed; the bar still in progress
+    ends now
+    """
+    now = pd.Timestamp.now(tz='UTC')
+    ends = index.tz_convert('UTC') + pd.Timedelta(interval)
+    return ends.where(ends <= now, now)
+
+
+def _history(ticker, start_date, end_date, interval):
+    """
+    Download bars for a single ticker, raising on failed requests (rate limits, network errors)
+    instead of returning an empty frame; only a range without bars comes back empty
+    """
+    try:
+        return yf.Ticker(ticker).history(start=start_date, end=end_date, interval=interval, raise_errors=True)
+    except YFPricesMissingError:
+        return pd.DataFrame()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_download(ticker, start_date, end_date, interval):
+    """
+    Download bars for a single ticker, keeping only the close indexed by bar end in UTC.
+    Falls back to 1-minute bars if the requested interval is empty. Results are also kept in the
+    disk cache so they survive restarts; bars for past days never change and are kept for a month.
+    """
+    if end_date <= datetime.now(AR_TZ).date():
+        ttl = HISTORY_TTL
+        key = (ticker, start_date.isoformat(), end_date.isoformat(), interval)
+        tag = None
+    else:
+        # Short TTL while either market is trading, longer once prices stop moving
+        ttl = 60 if markets_trading() else 3600
+        key = (ticker, start_date.isoformat(), end_date.isoformat(), interval, int(time.time() // ttl))
+        tag = 'prices'
+    stock = cache.get(key)
+    if stock is not None:
+        return stock
+
+    stock = _history(ticker, start_date, end_date, interval)
+    if stock.empty and interval != '1m':
+        interval = '1m'
+        stock = _history(ticker, start_date, end_date, interval)
+    if stock.empty:
+        return stock
+
+    if 'Close' in stock:
+        stock = stock[['Close']]
+    stock.index = _bar_ends(stock.index, interval)
+
+    cache.set(key, stock, expire=ttl, tag=tag)
+    return stock
+
+def get_yf_data(ticker, start_date, end_date, apply_delay=False, retries=3, interval='5m'):
     """
-    Fetch data from yfinance with optional 20-minute delay and fallback to previous available date
+    Fetch data from yfinance with optional 20-minute delay and fallback to previous available date.
+    Uses 5-minute bars by default, falling back to 1-minute bars if the coarser interval is empty.
+    The delay is applied outside the download cache since it depends on the current time.
     """
     original_start_date = start_date
     max_days_back = 5  # Maximum number of days to look back
 
+    last_error = None
+
+    # Walk back one day at a time on empty results; only transport errors are retried
     for days_back in range(max_days_back):
         adjusted_start_date = original_start_date - timedelta(days=days_back)
         adjusted_end_date = end_date - timedelta(days=days_back)
 
+        # Markets are closed on weekends, don't ask Yahoo for bars that can't exist
+        if adjusted_start_date.weekday() >= 5:
+            continue
+
+        stock = None
         for attempt in range(retries):
             try:
-                stock = yf.download(ticker,
-                                    start=adjusted_start_date,
-                                    end=adjusted_end_date,
-                                    interval='1m',
-                                    progress=False)
+                stock = _cached_download(ticker, adjusted_start_date, adjusted_end_date, interval)
+                break
+            except Exception as e:
+                last_error = e
+                if attempt == retries - 1 or not _take_retry():
+                    break
+                # Exponential backoff with jitter so tickers failing together don't retry in lockstep
+                time.sleep(0.2 * 2 ** attempt + random.random() * 0.1)
+
+        # A failed download says nothing about whether the day has data, so don't walk back past it
+        if stock is None:
+            break
+        if stock.empty:
+            continue
+
+        if apply_delay:
+            stock = filter_delayed(stock)
+
+        if not stock.empty:
+            if days_back > 0:
+                st.info(
+                    f"Using data from {adjusted_start_date.strftime('%Y-%m-%d')} for {ticker} as current date data is not available.")
+            return stock
+
+    if last_error is not None:
+        st.error(f"Failed to fetch data for {ticker} after {retries} attempts: {str(last_error)}")
+    return None
 
+@st.cache_data(ttl=60, show_spinner=False)
+def get_yf_batch(symbols, start_date, end_date, chunk_size=20, interval='5m'):
+    """
+    Fetch bars at `interval` for several tickers in as few requests as possible (up to 20 symbols per request)
+    Returns: dict of ticker -> DataFrame, tickers without data are left out
+    """
+    frames = {}
+    for i in range(0, len(symbols), chunk_size):
+        chunk = list(symbols[i:i + chunk_size])
+        try:
+            with _download_lock:
+                bulk = yf.download(chunk,
+                                   start=start_date,
+                                   end=end_date,
+                                   interval=interval,
+                                   group_by='ticker',
+                                   threads=True,
+                                   progress=False)
+        except Exception:
+            continue
+
+        for symbol in chunk:
+            if symbol in bulk.columns.get_level_values(0):
+                stock = bulk[symbol]
+                if 'Close' in stock:
+                    stock = stock[['Close']]
+                stock = stock.dropna(how='all')
+                stock.index = _bar_ends(stock.index, interval)
                 if not stock.empty:
-                    if apply_delay:
-                        # Apply 20-minute delay by filtering out data newer than current time minus 20 minutes
-                        current_time = datetime.now(pytz.UTC)
-                        delay_mask = stock.index <= (current_time - timedelta(minutes=20))
-                        stock = stock[delay_mask]
-
-                    if not stock.empty:
-                        if days_back > 0:
-                            st.info(
-                                f"Using data from {adjusted_start_date.strftime('%Y-%m-%d')} for {ticker} as current date data is not available.")
-                        return stock
-
-                time.sleep(1)
-            except Exception as e:
-                if attempt == retries - 1 and days_back == max_days_back - 1:
-                    st.error(f"Failed to fetch data for {ticker} after {retries} attempts: {str(e)}")
-                time.sleep(1)
+                    frames[symbol] = stock
+    return frames
 
-    return None
+def filter_delayed(stock):
+    """
+    Apply 20-minute delay by filtering out bars that end after current time minus 20 minutes
+    """
+    cut = datetime.now(timezone.utc) - timedelta(minutes=20)
+    # The index is sorted, so a binary search finds the cut point and the slice is a view
+    pos = stock.index.searchsorted(cut, side='right')
+    return stock.iloc[:pos]
 
-def should_apply_delay():
+def markets_trading(now=None):
     """
-    Determine if we should apply delay based on current time
+    Determine if either market can be trading at the current time (or the given Argentina time)
     Returns: bool
     """
-    tz = pytz.timezone('America/Argentina/Buenos_Aires')
-    now = datetime.now(tz)
-
-    # Create time objects for comparison
-    market_start = now.replace(hour=11, minute=30, second=0, microsecond=0)
-    market_end = now.replace(hour=17, minute=0, second=0, microsecond=0)
+    if now is None:
+        now = datetime.now(AR_TZ)
+    return now.weekday() < 5 and SESSION_START <= now.time() < SESSION_END
 
+def should_apply_delay(now=None):
+    """
+    Determine if we should apply delay based on current time (or the given Argentina time)
+    Returns: bool
+    """
+    if now is None:
+        now = datetime.now(AR_TZ)
     # Return True only if we're between 11:30 and 17:00
-    return market_start <= now.replace(microsecond=0) < market_end
+    return MARKET_OPEN <= now.time() < MARKET_CLOSE
 
 
-def get_prices_and_calculate(arg_ticker, us_ticker):
-    try:
-        tz = pytz.timezone('America/Argentina/Buenos_Aires')
-        now = datetime.now(tz)
-
-        # Adjust start and end dates to ensure we capture today's trading
-        start_date = now.date()  # Start from today
-        end_date = now.date() + timedelta(days=1)  # Until tomorrow
-
-        # Check if we should apply delay to US data
-        apply_us_delay = should_apply_delay()
-
-        result = {
-            'arg_price': None,
-            'us_price_17': None,
-            'us_price_18': None,
-            'arg_time': None,
-            'us_time': None,
-            'time_17': None,
-            'delayed_status': 'DELAYED' if apply_us_delay else 'REAL-TIME'
-        }
-
-        # Fetch Argentine data (always delayed by 20 minutes)
-        arg_data = get_yf_data(f"{arg_ticker}.BA", start_date, end_date, apply_delay=True)
-        if arg_data is not None and not arg_data.empty:
-            result['arg_price'] = float(arg_data['Close'].iloc[-1])
-            result['arg_time'] = arg_data.index[-1].tz_convert(tz).strftime('%H:%M:%S')
+@dataclass(slots=True)
+class PriceSnapshot:
+    """
+    Prices for a ticker pair; missing prices are NaN and missing times are empty strings
+    """
+    arg_price: float = float('nan')
+    us_price_17: float = float('nan')
+    us_price_18: float = float('nan')
+    arg_time: str = ''
+    us_time: str = ''
+    time_17: str = ''
+    delayed: bool = False
 
-        # Fetch US data with conditional delay
-        us_data = get_yf_data(us_ticker, start_date, end_date, apply_delay=apply_us_delay)
-        if us_data is not None and not us_data.empty:
-            result['us_price_18'] = float(us_data['Close'].iloc[-1])
-            result['us_time'] = us_data.index[-1].tz_convert(tz).strftime('%H:%M:%S')
+    @property
+    def delayed_status(self):
+        return 'DELAYED' if self.delayed else 'REAL-TIME'
 
-            # Find today's price closest to 17:00 within a ±10 minute window
-            target_time = now.replace(hour=17, minute=0, second=0, microsecond=0)
-            window_start = target_time - timedelta(minutes=10)
-            window_end = target_time + timedelta(minutes=10)
 
-            # Filter data for today only
-            today_data = us_data[us_data.index.date == now.date()]
+def get_prices_and_calculate(arg_data, us_data, target_ns, window_start_ns, window_end_ns, us_delayed=False):
+    """
+    Extract closing prices for a ticker pair from already fetched (and delay-filtered) data.
+    target_ns is today's 17:00 (Argentina) as epoch nanoseconds and the window bounds the search
+    for the US bar ending closest to it.
+    """
+    try:
+        result = PriceSnapshot(delayed=us_delayed)
 
-            if not today_data.empty:
-                # Convert index to Argentina timezone for comparison
-                today_data_tz = today_data.copy()
-                today_data_tz.index = today_data_tz.index.tz_convert(tz)
+        if arg_data is not None and not arg_data.empty:
+            result.arg_price = float(arg_data['Close'].to_numpy()[-1])
+            result.arg_time = arg_data.index[-1].tz_convert(AR_TZ).strftime('%H:%M:%S')
 
-                # Find closest time to 17:00
-                target_mask = (today_data_tz.index.time >= window_start.time()) & \
-                              (today_data_tz.index.time <= window_end.time())
-                window_data = today_data_tz[target_mask]
+        if us_data is not None and not us_data.empty:
+            us_close = us_data['Close'].to_numpy()
+            result.us_price_18 = float(us_close[-1])
+            result.us_time = us_data.index[-1].tz_convert(AR_TZ).strftime('%H:%M:%S')
+
+            # Find today's bar ending closest to 17:00 within a ±10 minute window, working on the
+            # int64 nanosecond view of the (UTC) index so nothing is boxed or tz-converted
+            i8 = us_data.index.as_unit('ns').asi8
+            pos = i8.searchsorted(target_ns)
+            candidates = [p for p in (pos - 1, pos) if 0 <= p < len(i8)]
+            closest = min(candidates, key=lambda p: abs(i8[p] - target_ns))
 
-                if not window_data.empty:
-                    closest_time = min(window_data.index,
-                                       key=lambda x: abs(x.replace(second=0, microsecond=0) - target_time))
-                    result['us_price_17'] = float(window_data.loc[closest_time, 'Close'])
-                    result['time_17'] = closest_time.strftime('%H:%M:%S')
+            if window_start_ns <= i8[closest] <= window_end_ns:
+                result.us_price_17 = float(us_close[closest])
+                result.time_17 = us_data.index[closest].tz_convert(AR_TZ).strftime('%H:%M:%S')
 
         return result
 
@@ -126,24 +304,118 @@ def get_prices_and_calculate(arg_ticker, us_ticker):
         st.error(f"Error en get_prices_and_calculate: {str(e)}")
         return None
 
+def fetch_all(selected_tickers, us_tickers, now_arg, target_time, window_start, window_end, apply_us_delay):
+    """
+    Fetch prices for all selected tickers with one batched download per market, downloading any
+    symbol missing from the batch individually on the shared thread pool.
+    Returns: dict of Argentine ticker -> PriceSnapshot (None on error)
+    """
+    start_date = target_time.date()
+    end_date = start_date + timedelta(days=1)
+
+    # The batch only needs the latest bars and the 17:00 window, so start at whichever comes
+    # first of the window and the top of the previous hour (hour-aligned to keep the cache key stable)
+    batch_start = min(window_start, (now_arg - timedelta(hours=1)).replace(minute=0, second=0, microsecond=0))
+
+    # Argentine data is always delayed by 20 minutes, US data conditionally
+    arg_symbols = {arg_ticker: f"{arg_ticker}.BA" for arg_ticker in selected_tickers}
+    delays = dict.fromkeys(arg_symbols.values(), True)
+    delays.update(dict.fromkeys(us_tickers.values(), apply_us_delay))
+
+    data = get_yf_batch(tuple(arg_symbols.values()), batch_start, end_date)
+    data.update(get_yf_batch(tuple(dict.fromkeys(us_tickers.values())), batch_start, end_date))
+    data = {symbol: filter_delayed(stock) if delays[symbol] else stock for symbol, stock in data.items()}
+
+    # Weekends and before the open every symbol can end up here at once, so download them in parallel
+    missing = {symbol: _submit(get_yf_data, symbol, start_date, end_date, apply_delay=delay)
+               for symbol, delay in delays.items() if symbol not in data or data[symbol].empty}
+    data.update({symbol: future.result() for symbol, future in missing.items()})
+
+    # The 17:00 target and window as epoch nanoseconds, converted once for all tickers
+    target_ns, window_start_ns, window_end_ns = (pd.Timestamp(t).value
+                                                 for t in (target_time, window_start, window_end))
+    futures = {arg_ticker: _submit(get_prices_and_calculate, data[arg_symbols[arg_ticker]],
+                                   data[us_tickers[arg_ticker]], target_ns, window_start_ns, window_end_ns,
+                                   apply_us_delay)
+               for arg_ticker in selected_tickers}
+    return {arg_ticker: future.result() for arg_ticker, future in futures.items()}
+
 def calculate_theoretical_price(arg_price, us_price_17, us_price_18, ratio):
-    if not us_price_17 or us_price_17 == 0:
-        return None
-    pct_change = (us_price_18 - us_price_17) / us_price_17
-    theoretical_price = arg_price * (1 + pct_change)
-    return theoretical_price
+    """
+    Theoretical Argentine price for each ticker; NaN where the 17:00 US price is missing
+    """
+    # arg * (1 + (us_18 - us_17) / us_17) simplifies to arg * us_18 / us_17
+    return arg_price * us_price_18 / us_price_17.where(us_price_17 > 0)
 
 def calculate_implied_exchange_rate(arg_price, us_price, ratio):
-    if arg_price and us_price and ratio and us_price > 0:
-        return (arg_price * ratio) / us_price
-    return None
+    """
+    Implied exchange rate for each ticker; NaN where a price or the ratio is missing
+    """
+    return (arg_price * ratio.where(ratio != 0)) / us_price.where(us_price > 0)
+
+def calculate_all(prices_df):
+    """
+    Compute theoretical prices, differences and implied exchange rates for all tickers at once.
+    Prices that are zero (not entered) count as missing.
+    """
+    arg = prices_df['arg_price'].where(prices_df['arg_price'] > 0)
+    us_17 = prices_df['us_price_17'].where(prices_df['us_price_17'] > 0)
+    us_current = prices_df['us_price_current'].where(prices_df['us_price_current'] > 0)
+    ratio = prices_df['ratio']
+
+    result = prices_df.assign(arg_price=arg, us_price_17=us_17, us_price_current=us_current)
+    # Only tickers with all three prices get a theoretical price; the rest stay NaN without branching
+    result['complete'] = arg.notna() & us_17.notna() & us_current.notna()
+    result['theoretical_price'] = calculate_theoretical_price(arg, us_17, us_current, ratio).where(result['complete'])
+    result['diff'] = result['theoretical_price'] - arg
+    result['pct_change'] = (result['theoretical_price'] / arg - 1) * 100
+    result['implied_rate_current'] = calculate_implied_exchange_rate(arg, us_current, ratio)
+    # Fall back to the current rate when there's no 17:00 rate
+    result['implied_rate_17'] = calculate_implied_exchange_rate(arg, us_17, ratio).fillna(
+        result['implied_rate_current'])
+    return result
+
+def build_summary(raw_df):
+    """
+    Build the summary table with numeric columns; formatting is applied only for display
+    """
+    return pd.DataFrame({
+        'Ticker Argentino': raw_df['arg_ticker'],
+        'Ticker EEUU': raw_df['us_ticker'],
+        'Ratio': raw_df['ratio'],
+        'Cierre Argentina': raw_df['arg_price'],
+        'Precio EEUU 17:00': raw_df['us_price_17'],
+        'Cierre EEUU': raw_df['us_price_current'],
+        'Precio Teórico': raw_df['theoretical_price'],
+        'Diferencia': raw_df['diff'],
+        'Diferencia %': raw_df['pct_change'],
+        'TC Implícito 17:00': raw_df['implied_rate_17'],
+        'TC Implícito Actual': raw_df['implied_rate_current']
+    })
+
+@st.cache_data
+def to_csv_bytes(df):
+    """
+    Serialize a DataFrame to UTF-8 CSV, cached so reruns with the same summary skip the encoding
+    """
+    return df.to_csv(index=False).encode('utf-8')
+
+@st.cache_data
+def load_pairs():
+    """
+    Load the ticker pairs once per process, indexed by Argentine ticker for O(1) lookups
+    """
+    pairs_df = pd.read_csv('TickersRatios.csv',
+                           dtype={'ArgentineTicker': 'string', 'WallStreetTicker': 'string', 'Ratio': 'float64'})
+    # Rows without a US ticker can't be priced; keep the index unique for dict lookups
+    pairs_df = pairs_df.dropna(subset=['WallStreetTicker']).drop_duplicates('ArgentineTicker')
+    return pairs_df.set_index('ArgentineTicker')
 
 def main():
     st.title('Calculadora de Precios de Cierre del Mercado Argentino')
 
-    pairs_df = pd.read_csv('TickersRatios.csv')
+    pairs_df = load_pairs()
     selected_tickers = []
-    all_summary_data = []  # List for summary data
 
     if pairs_df is not None:
         input_method = st.radio(
@@ -157,47 +429,72 @@ def main():
                 help='Ingrese los tickers argentinos separados por coma, sin espacios'
             )
             if ticker_input:
-                input_tickers = [ticker.strip() for ticker in ticker_input.split(',')]
-                selected_tickers = [ticker for ticker in input_tickers
-                                    if ticker in pairs_df['ArgentineTicker'].values]
-                invalid_tickers = set(input_tickers) - set(selected_tickers)
+                # Repeated tickers would share one expander and add duplicate summary rows
+                input_tickers = list(dict.fromkeys(ticker.strip() for ticker in ticker_input.split(',')))
+                valid_tickers = frozenset(pairs_df.index)
+                selected_tickers = [ticker for ticker in input_tickers if ticker in valid_tickers]
+                invalid_tickers = [ticker for ticker in input_tickers if ticker not in valid_tickers]
                 if invalid_tickers:
                     st.warning(f"Tickers no válidos: {', '.join(invalid_tickers)}")
         else:
             selected_tickers = st.multiselect(
                 'Seleccionar Tickers Argentinos',
-                pairs_df['ArgentineTicker'].tolist()
+                pairs_df.index.tolist()
             )
 
-        if selected_tickers:
-            for arg_ticker in selected_tickers:
-                row = pairs_df[pairs_df['ArgentineTicker'] == arg_ticker].iloc[0]
-                us_ticker = row['WallStreetTicker']
-                ratio = row['Ratio']
-
-                st.write('---')
-                st.subheader(f'Información para {arg_ticker}')
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.write(f'🇦🇷 **Ticker Argentino:** {arg_ticker}')
-                with col2:
-                    st.write(f'🇺🇸 **Ticker EEUU:** {us_ticker}')
-                with col3:
-                    st.write(f'📊 **Ratio:** {ratio}')
-
-                with st.spinner('Obteniendo datos del mercado...'):
-                    prices = get_prices_and_calculate(arg_ticker, us_ticker)
+        # Nothing else to compute or render until a ticker is selected
+        if not selected_tickers:
+            return
+
+        # Plain dict lookups per ticker instead of pandas indexing
+        pairs_map = pairs_df[['WallStreetTicker', 'Ratio']].to_dict('index')
+
+        # Fetch all tickers concurrently, then render them in order on the main thread
+        us_tickers = {arg_ticker: pairs_map[arg_ticker]['WallStreetTicker']
+                      for arg_ticker in selected_tickers}
+        # Current time, today's 17:00 (Argentina) and the search window, built once for all tickers
+        now_arg = datetime.now(AR_TZ)
+        target_time = datetime.combine(now_arg.date(), MARKET_CLOSE, tzinfo=AR_TZ)
+        window_start = target_time - CLOSE_WINDOW
+        window_end = target_time + CLOSE_WINDOW
+        apply_us_delay = should_apply_delay(now_arg)
+
+        with st.spinner('Obteniendo datos del mercado...'):
+            all_prices = fetch_all(selected_tickers, us_tickers, now_arg, target_time, window_start,
+                                   window_end, apply_us_delay)
+
+        # The summary table is the primary view; per-ticker detail goes in expanders below it
+        summary_area = st.container()
+        details = {}
+        # Prices per field (one list per column) rather than one dict per ticker
+        price_columns = {field: [] for field in ('arg_ticker', 'us_ticker', 'ratio', 'arg_price',
+                                                 'us_price_17', 'us_price_current')}
+
+        for arg_ticker in selected_tickers:
+            row = pairs_map[arg_ticker]
+            us_ticker = row['WallStreetTicker']
+            ratio = row['Ratio']
+
+            prices = all_prices[arg_ticker]
+            # Open the detail by default only when a price has to be entered manually
+            missing_prices = not prices or any(map(math.isnan, (prices.arg_price, prices.us_price_17,
+                                                                prices.us_price_18)))
+
+            details[arg_ticker] = st.expander(f'Información para {arg_ticker}', expanded=missing_prices)
+            with details[arg_ticker]:
+                st.markdown(f'🇦🇷 **Ticker Argentino:** {arg_ticker} · 🇺🇸 **Ticker EEUU:** {us_ticker} · '
+                            f'📊 **Ratio:** {ratio}')
 
                 col1, col2, col3 = st.columns(3)
 
                 # Argentine price
                 with col1:
-                    if prices and prices['arg_price'] is not None:
+                    if prices and not math.isnan(prices.arg_price):
                         st.metric(
-                            f"Cierre Argentina ({prices['arg_time']}) - DELAYED",
-                            f"ARS {prices['arg_price']:.2f}"
+                            f"Cierre Argentina ({prices.arg_time}) - DELAYED",
+                            _fmt_ars(prices.arg_price)
                         )
-                        arg_price = prices['arg_price']
+                        arg_price = prices.arg_price
                     else:
                         st.warning("Precio Argentina no disponible")
                         arg_price = st.number_input(
@@ -210,15 +507,15 @@ def main():
 
                 # US 17:00 price
                 with col2:
-                    if prices and prices['us_price_17'] is not None:
+                    if prices and not math.isnan(prices.us_price_17):
                         st.metric(
-                            f"Precio EEUU {prices.get('time_17', '17:00')} GMT-3",
-                            f"USD {prices['us_price_17']:.2f}"
+                            f"Precio EEUU {prices.time_17 or '17:00'} GMT-3",
+                            _fmt_usd(prices.us_price_17)
                         )
-                        us_price_17 = prices['us_price_17']
+                        us_price_17 = prices.us_price_17
                     else:
-                        if prices and prices.get('time_17'):
-                            st.warning(f"Precio más cercano encontrado: {prices['time_17']}")
+                        if prices and prices.time_17:
+                            st.warning(f"Precio más cercano encontrado: {prices.time_17}")
                         else:
                             st.warning("Precio EEUU 17:00 no disponible")
                         us_price_17 = st.number_input(
@@ -231,12 +528,12 @@ def main():
 
                 # US current price
                 with col3:
-                    if prices and prices['us_price_18'] is not None:
+                    if prices and not math.isnan(prices.us_price_18):
                         st.metric(
-                            f"Cierre EEUU ({prices['us_time']}) - {prices['delayed_status']}",
-                            f"USD {prices['us_price_18']:.2f}"
+                            f"Cierre EEUU ({prices.us_time}) - {prices.delayed_status}",
+                            _fmt_usd(prices.us_price_18)
                         )
-                        us_price_current = prices['us_price_18']
+                        us_price_current = prices.us_price_18
                     else:
                         st.warning("Precio EEUU actual no disponible")
                         us_price_current = st.number_input(
@@ -247,95 +544,78 @@ def main():
                             key=f"us_price_current_{arg_ticker}"
                         )
 
-                # Initialize variables
-                theoretical_price = None
-                diff = None
-                pct_change = None
-
-                # Calculate theoretical price if all required US prices are available
-                if arg_price > 0 and us_price_17 > 0 and us_price_current > 0:
-                    theoretical_price = calculate_theoretical_price(
-                        arg_price,
-                        us_price_17,
-                        us_price_current,
-                        ratio
-                    )
-                    if theoretical_price:
-                        calc_col1, calc_col2 = st.columns(2)
-                        with calc_col1:
-                            st.metric("Precio Teórico", f"ARS {theoretical_price:.2f}")
-                        diff = theoretical_price - arg_price
-                        pct_change = ((theoretical_price / arg_price) - 1) * 100
-                        with calc_col2:
-                            st.metric("Diferencia", f"ARS {diff:.2f}", f"{pct_change:+.2f}%")
+            price_columns['arg_ticker'].append(arg_ticker)
+            price_columns['us_ticker'].append(us_ticker)
+            price_columns['ratio'].append(ratio)
+            price_columns['arg_price'].append(arg_price)
+            price_columns['us_price_17'].append(us_price_17)
+            price_columns['us_price_current'].append(us_price_current)
+
+        # Derived values for all tickers in one pass, then fill in each ticker's detail
+        results = calculate_all(pd.DataFrame(price_columns))
+
+        for row in results.itertuples(index=False):
+            prices = all_prices[row.arg_ticker]
+            with details[row.arg_ticker]:
+                if row.complete:
+                    calc_col1, calc_col2 = st.columns(2)
+                    with calc_col1:
+                        st.metric("Precio Teórico", _fmt_ars(row.theoretical_price))
+                    with calc_col2:
+                        st.metric("Diferencia", _fmt_ars(row.diff), f"{row.pct_change:+.2f}%")
                 else:
                     st.info("No se pudo calcular el precio teórico debido a datos incompletos (faltan precios de EEUU a 17:00 o actual).")
 
-                # Calculate implied exchange rates
-                implied_rate_current = calculate_implied_exchange_rate(arg_price, us_price_current, ratio) if arg_price > 0 and us_price_current > 0 else None
-                implied_rate_17 = calculate_implied_exchange_rate(arg_price, us_price_17, ratio) if arg_price > 0 and us_price_17 > 0 else None
-
-                # Fallback for implied rate display
-                if not implied_rate_17 and implied_rate_current:
-                    implied_rate_17 = implied_rate_current
-
                 st.write("---")
                 st.write("**Tipo de Cambio Implícito:**")
                 disp_col1, disp_col2 = st.columns(2)
                 with disp_col1:
                     st.metric("TC Implícito 17:00",
-                             f"ARS {implied_rate_17:.2f}" if implied_rate_17 else "N/A")
+                             _fmt_ars(row.implied_rate_17) if row.implied_rate_17 > 0 else "N/A")
                 with disp_col2:
-                    us_time_label = prices['us_time'] if prices and prices.get('us_time') else 'Actual'
+                    us_time_label = prices.us_time if prices and prices.us_time else 'Actual'
                     st.metric(f"TC Implícito {us_time_label}",
-                             f"ARS {implied_rate_current:.2f}" if implied_rate_current else "N/A")
-
-                # Append data to summary if possible
-                if arg_price > 0 and us_price_17 > 0 and us_price_current > 0:
-                    summary_row = {
-                        'Ticker Argentino': arg_ticker,
-                        'Ticker EEUU': us_ticker,
-                        'Ratio': ratio,
-                        'Cierre Argentina': f"ARS {arg_price:.2f}",
-                        'Precio EEUU 17:00': f"USD {us_price_17:.2f}",
-                        'Cierre EEUU': f"USD {us_price_current:.2f}",
-                        'Precio Teórico': f"ARS {theoretical_price:.2f}" if theoretical_price else "N/A",
-                        'Diferencia': f"ARS {diff:.2f} ({pct_change:+.2f}%)" if theoretical_price else "N/A",
-                        'TC Implícito 17:00': f"ARS {implied_rate_17:.2f}" if implied_rate_17 else "N/A",
-                        'TC Implícito Actual': f"ARS {implied_rate_current:.2f}" if implied_rate_current else "N/A"
-                    }
-                    all_summary_data.append(summary_row)
-
-            # Display summary of operations
-            if all_summary_data:
-                st.write("---")
-                st.write("**Resumen de Operaciones**")
-                summary_df = pd.DataFrame(all_summary_data)
-                st.dataframe(summary_df, use_container_width=True, hide_index=True)
-                csv_summary = summary_df.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 Descargar Resumen",
-                    data=csv_summary,
-                    file_name=f'resumen_tickers_{datetime.now().strftime("%Y%m%d")}.csv',
-                    mime='text/csv',
-                )
-
-            with st.expander('Mostrar Información de Depuración'):
-                st.write('Información de Depuración:')
-                st.write(f'Hora actual (Argentina): {datetime.now(pytz.timezone("America/Argentina/Buenos_Aires"))}')
-                if 'prices' in locals():
-                    st.write('Datos de precios:', {
-                        'Precio Argentina': prices.get('arg_price'),
-                        'Precio EEUU 17:00': prices.get('us_price_17'),
-                        'Precio EEUU actual': prices.get('us_price_18'),
-                        'Hora Argentina': prices.get('arg_time'),
-                        'Hora EEUU': prices.get('us_time'),
-                        'Hora precio 17:00': prices.get('time_17'),
-                        'Estado delay US': prices.get('delayed_status')
-                    })
-
-            if st.button('🔄 Actualizar Precios'):
-                st.experimental_rerun()
+                             _fmt_ars(row.implied_rate_current) if row.implied_rate_current > 0 else "N/A")
+
+        # Display summary of operations, one row per ticker; missing values show as N/A
+        with summary_area:
+            st.write("**Resumen de Operaciones**")
+            summary_df = build_summary(results)
+            st.dataframe(summary_df.style.format(SUMMARY_FORMATS, na_rep='N/A'),
+                         use_container_width=True, hide_index=True)
+            csv_summary = to_csv_bytes(summary_df)
+            st.download_button(
+                label="📥 Descargar Resumen",
+                data=csv_summary,
+                file_name=f'resumen_tickers_{datetime.now().strftime("%Y%m%d")}.csv',
+                mime='text/csv',
+            )
+            st.write("---")
+
+        # Only build the debug payload when it has been asked for
+        if st.checkbox('Mostrar Información de Depuración', key='show_debug'):
+            st.write('Información de Depuración:')
+            st.write(f'Hora actual (Argentina): {datetime.now(AR_TZ)}')
+            for arg_ticker, prices in all_prices.items():
+                if not prices:
+                    st.write(f'Datos de precios {arg_ticker}: no disponibles')
+                    continue
+                st.write(f'Datos de precios {arg_ticker}:', {
+                    'Precio Argentina': prices.arg_price,
+                    'Precio EEUU 17:00': prices.us_price_17,
+                    'Precio EEUU actual': prices.us_price_18,
+                    'Hora Argentina': prices.arg_time,
+                    'Hora EEUU': prices.us_time,
+                    'Hora precio 17:00': prices.time_17,
+                    'Estado delay US': prices.delayed_status
+                })
+
+        if st.button('🔄 Actualizar Precios'):
+            # Invalidate only the price caches; the ticker pairs stay cached
+            _cached_download.clear()
+            get_yf_batch.clear()
+            cache.evict('prices')
+            st.rerun()
 
 if __name__ == '__main__':
     main()